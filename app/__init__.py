@@ -1,12 +1,30 @@
+import threading
+
 from flask import Flask
 from .config import Config
+from .db import open_pool, refresh_leaderboard_forever
+from .json_provider import ORJSONProvider
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = ORJSONProvider(app)
 
     from .routes import bp
     app.register_blueprint(bp)
 
+    # Gunicorn calls this in each worker after forking, so every worker
+    # gets its own pool, fully connected before it serves a request.
+    open_pool()
+
+    interval = app.config['LEADERBOARD_REFRESH_SECONDS']
+    if interval > 0:
+        threading.Thread(
+            target=refresh_leaderboard_forever,
+            args=(interval, app.logger),
+            name='leaderboard-refresh',
+            daemon=True,
+        ).start()
+
     return app
@@ -9,3 +9,4 @@ class Config:
     )
     HOSTNAME = os.environ.get('HOSTNAME', 'localhost')
     RACE_ROUND_SECONDS = int(os.environ.get('RACE_ROUND_SECONDS', '300'))
+    LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('LEADERBOARD_REFRESH_SECONDS', '60'))
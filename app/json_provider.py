@@ -0,0 +1,32 @@
+"""Flask JSON provider backed by orjson."""
+
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class ORJSONProvider(JSONProvider):
+    """Serialize jsonify() responses with orjson.
+
+    orjson encodes datetimes natively (ISO 8601) and writes bytes straight
+    into the response without an intermediate str.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default), mimetype='application/json',
+        )
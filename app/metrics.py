@@ -0,0 +1,43 @@
+"""Prometheus metrics for the database connection pool.
+
+Under Gunicorn, set PROMETHEUS_MULTIPROC_DIR so every worker writes its
+samples there and /metrics aggregates them across workers.
+"""
+
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+POOL_ACQUIRES = Counter(
+    'wb_pool_acquires_total',
+    'Connection pool checkouts by outcome.',
+    ['outcome'],
+)
+# Upper buckets reach ConnectionPool's default 30 s getconn timeout, so
+# waits on an exhausted pool are not all lumped into +Inf.
+POOL_WAIT_SECONDS = Histogram(
+    'wb_pool_wait_seconds',
+    'Time spent waiting for a pooled connection.',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+             2.5, 5.0, 10.0, 30.0),
+)
+# Summed over live workers; a dead worker's values are dropped.
+POOL_IN_USE = Gauge(
+    'wb_pool_in_use',
+    'Connections currently checked out of the pool.',
+    multiprocess_mode='livesum',
+)
+POOL_IDLE = Gauge(
+    'wb_pool_idle',
+    'Open connections idle in the pool.',
+    multiprocess_mode='livesum',
+)
+
+
+def metrics_registry():
+    """Return the registry to expose: all workers' samples in multiprocess mode."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
@@ -1,18 +1,35 @@
 import hashlib
-import json
+import threading
 import time
 from datetime import datetime, timezone
+from functools import lru_cache
 
-from flask import Blueprint, jsonify, make_response, render_template, request
+from cachetools import TTLCache
+from flask import Blueprint, Response, g, jsonify, make_response, render_template, request
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from .config import Config
-from .db import execute_db, query_db
+from .db import execute_db, query_db, query_pipeline, query_prepared, transaction
+from .metrics import metrics_registry
 
 bp = Blueprint('main', __name__)
 
 ROUND_SECONDS = Config.RACE_ROUND_SECONDS
 COOKIE_NAME = 'wb_player'
 COOKIE_MAX_AGE = 12 * 60 * 60  # 12 hours
+PLAYER_CACHE_TTL = 60  # seconds
+
+# Per-letter codes stored in guesses.result
+RESULT_STATUSES = {'C': 'correct', 'P': 'present', 'A': 'absent'}
+
+# Fingerprint -> player row.  Only hits are cached: player rows are never
+# updated or deleted, so a cached hit cannot go stale, while a miss must not
+# hide a registration made through another worker.
+_player_cache = TTLCache(maxsize=4096, ttl=PLAYER_CACHE_TTL)
+_player_cache_lock = threading.Lock()
+
+# The words table is seeded once and never changes while the app runs.
+_word_set: frozenset[str] | None = None
 
 
 # ---------------------------------------------------------------------------
@@ -24,23 +41,28 @@ def _compute_fingerprint() -> str:
     ip = request.headers.get('X-Forwarded-For', request.remote_addr or '')
     if ',' in ip:
         ip = ip.split(',')[0].strip()
-    raw = (
-        ip
-        + (request.headers.get('User-Agent', ''))
-        + (request.headers.get('Accept-Language', ''))
-    )
-    return hashlib.sha256(raw.encode()).hexdigest()
+    # Kept as SHA-256: the digest is the stored identity of existing players.
+    raw = ''.join((
+        ip,
+        request.headers.get('User-Agent', ''),
+        request.headers.get('Accept-Language', ''),
+    )).encode()
+    return hashlib.sha256(raw).hexdigest()
 
 
 def get_fingerprint() -> str:
-    """Return player fingerprint from cookie (preferred) or computed hash."""
-    cookie_fp = request.cookies.get(COOKIE_NAME)
-    if cookie_fp:
+    """Return player fingerprint from cookie (preferred) or computed hash.
+
+    Memoized on ``g`` for the duration of the request.
+    """
+    if 'fingerprint' not in g:
+        cookie_fp = request.cookies.get(COOKIE_NAME)
         # Verify the cookie maps to a real player
-        player = _player_by_fingerprint(cookie_fp)
-        if player:
-            return cookie_fp
-    return _compute_fingerprint()
+        if cookie_fp and _player_by_fingerprint(cookie_fp):
+            g.fingerprint = cookie_fp
+        else:
+            g.fingerprint = _compute_fingerprint()
+    return g.fingerprint
 
 
 def _set_player_cookie(response, fingerprint: str):
@@ -55,11 +77,29 @@ def _set_player_cookie(response, fingerprint: str):
 
 
 def _player_by_fingerprint(fp: str):
-    return query_db(
-        'SELECT id, name, fingerprint, created_at FROM players WHERE fingerprint = %s',
-        (fp,),
-        one=True,
-    )
+    with _player_cache_lock:
+        player = _player_cache.get(fp)
+    if player is None:
+        player = query_prepared('player_by_fingerprint', (fp,), one=True)
+        if player:
+            with _player_cache_lock:
+                _player_cache[fp] = player
+    return player
+
+
+def _current_player():
+    """Return the requesting player (or None), memoized on ``g``."""
+    if 'player' not in g:
+        g.player = _player_by_fingerprint(get_fingerprint())
+    return g.player
+
+
+def _valid_words() -> frozenset[str]:
+    """Return the guess dictionary, loaded from the words table once per process."""
+    global _word_set
+    if not _word_set:
+        _word_set = frozenset(r['word'] for r in query_db('SELECT word FROM words'))
+    return _word_set
 
 
 def _serialize_player(p: dict) -> dict:
@@ -67,39 +107,69 @@ def _serialize_player(p: dict) -> dict:
         'id': p['id'],
         'name': p['name'],
         'fingerprint': p['fingerprint'],
-        'created_at': p['created_at'].isoformat(),
+        'created_at': p['created_at'],
     }
 
 
+def _serialize_guess(row: dict) -> dict:
+    return {
+        'guess': row['guess_word'],
+        'guess_number': row['guess_number'],
+        'result': _expand_result(row['guess_word'], row['result']),
+    }
+
+
+@lru_cache(maxsize=2048)
+def _target_profile(target: str):
+    """Precompute (bytes, per-letter counts) for a target word.
+
+    A game's target is fixed across up to six guesses, so this is built
+    once per word rather than on every guess.
+    """
+    tb = target.encode()
+    counts = bytearray(26)
+    for tc in tb:
+        counts[tc - 97] += 1
+    return tb, bytes(counts)
+
+
 def _evaluate_guess(guess: str, target: str):
-    """Return a list of {letter, status} dicts for each position.
+    """Return the 5-char status code for a guess, e.g. 'CAPAA'.
+
+    Both words must be 5 lowercase ASCII letters.  See RESULT_STATUSES.
 
     Algorithm:
-      1. First pass  – mark exact matches as 'correct'.
+      1. First pass  – mark exact matches as 'correct', consuming them from
+         a copy of the target's precomputed letter counts.
       2. Second pass – for remaining letters, mark as 'present' (consuming
-         one occurrence in the target) or 'absent'.
+         one counted occurrence) or 'absent'.
     """
-    result = [None] * 5
-    target_remaining = list(target)
+    gb = guess.encode()
+    tb, target_counts = _target_profile(target)
+    counts = bytearray(target_counts)
+    statuses = ['A'] * 5
 
     # First pass: correct
-    for i in range(5):
-        if guess[i] == target[i]:
-            result[i] = {'letter': guess[i], 'status': 'correct'}
-            target_remaining[i] = None  # consumed
+    for i, (gc, tc) in enumerate(zip(gb, tb)):
+        if gc == tc:
+            statuses[i] = 'C'
+            counts[tc - 97] -= 1
 
     # Second pass: present / absent
-    for i in range(5):
-        if result[i] is not None:
-            continue
-        letter = guess[i]
-        if letter in target_remaining:
-            result[i] = {'letter': letter, 'status': 'present'}
-            target_remaining[target_remaining.index(letter)] = None
-        else:
-            result[i] = {'letter': letter, 'status': 'absent'}
+    for i, gc in enumerate(gb):
+        if statuses[i] != 'C' and counts[gc - 97]:
+            counts[gc - 97] -= 1
+            statuses[i] = 'P'
 
-    return result
+    return ''.join(statuses)
+
+
+def _expand_result(guess: str, code: str):
+    """Expand a stored status code into the list of {letter, status} dicts sent to clients."""
+    return [
+        {'letter': letter, 'status': RESULT_STATUSES[c]}
+        for letter, c in zip(guess, code)
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -188,6 +258,11 @@ def leaderboard_page():
     return render_template('leaderboard.html')
 
 
+@bp.route('/metrics')
+def metrics():
+    return Response(generate_latest(metrics_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
 # ---------------------------------------------------------------------------
 # API routes
 # ---------------------------------------------------------------------------
@@ -201,7 +276,7 @@ def register():
 
     fp = get_fingerprint()
 
-    existing = _player_by_fingerprint(fp)
+    existing = _current_player()
     if existing:
         resp = make_response(jsonify({'error': 'Player already registered from this browser'}), 409)
         _set_player_cookie(resp, fp)
@@ -212,6 +287,9 @@ def register():
         'RETURNING id, name, fingerprint, created_at',
         (name, fp),
     )
+    g.player = player
+    with _player_cache_lock:
+        _player_cache.pop(fp, None)
     resp = make_response(jsonify(_serialize_player(player)), 201)
     _set_player_cookie(resp, fp)
     return resp
@@ -220,7 +298,7 @@ def register():
 @bp.route('/api/me')
 def me():
     fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if not player:
         return jsonify({'error': 'Player not found'}), 404
     resp = make_response(jsonify(_serialize_player(player)))
@@ -230,8 +308,7 @@ def me():
 
 @bp.route('/api/game/new', methods=['POST'])
 def new_game():
-    fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if not player:
         return jsonify({'error': 'Player not registered'}), 401
 
@@ -247,48 +324,28 @@ def new_game():
     if mode == 'race':
         rnd = _get_or_create_race_round(_current_round_number())
 
-        # Check for existing active race game in this round
-        active = query_db(
-            'SELECT id, status, num_guesses, created_at FROM games '
-            'WHERE player_id = %s AND race_round_id = %s AND status = %s',
-            (pid, rnd['id'], 'active'),
-            one=True,
+        # Resume, reject or create this round's game in one round-trip
+        game = query_prepared(
+            'race_game_for_round', (pid, rnd['id'], rnd['word_id']), one=True,
         )
-        if active:
-            guesses = query_db(
-                'SELECT guess_word, guess_number, result FROM guesses '
-                'WHERE game_id = %s ORDER BY guess_number',
-                (active['id'],),
-            )
+        if game['status'] == 'active' and not game['created']:
+            guesses = query_prepared('guesses_by_game', (game['id'],))
             return jsonify({
-                'game_id': active['id'],
+                'game_id': game['id'],
                 'mode': 'race',
                 'round_ends_at': rnd['ends_at'].isoformat() + 'Z'
                     if rnd['ends_at'].tzinfo is None else rnd['ends_at'].isoformat(),
-                'guesses': [
-                    {'guess': g['guess_word'], 'guess_number': g['guess_number'], 'result': g['result']}
-                    for g in guesses
-                ],
+                'guesses': [_serialize_guess(row) for row in guesses],
             })
 
-        # Check if player already completed this round
-        completed = query_db(
-            'SELECT id FROM games WHERE player_id = %s AND race_round_id = %s AND status IN (%s, %s)',
-            (pid, rnd['id'], 'won', 'lost'),
-            one=True,
-        )
-        if completed:
+        # Player already completed this round
+        if not game['created']:
             return jsonify({
                 'error': 'Already played this round',
                 'round_ends_at': rnd['ends_at'].isoformat() + 'Z'
                     if rnd['ends_at'].tzinfo is None else rnd['ends_at'].isoformat(),
             }), 409
 
-        game = execute_db(
-            'INSERT INTO games (player_id, word_id, race_round_id, mode) VALUES (%s, %s, %s, %s) '
-            'RETURNING id, status, num_guesses, created_at',
-            (pid, rnd['word_id'], rnd['id'], 'race'),
-        )
         return jsonify({
             'game_id': game['id'],
             'mode': 'race',
@@ -299,116 +356,114 @@ def new_game():
 
     else:
         # Random mode — original behavior
-        # Cancel any active random game first
-        execute_db(
-            'UPDATE games SET status = %s, completed_at = NOW() '
-            'WHERE player_id = %s AND mode = %s AND status = %s RETURNING id',
-            ('lost', pid, 'random', 'active'),
-        )
+        with transaction() as conn:
+            # Cancel any active random game first
+            execute_db(
+                'UPDATE games SET status = %s, completed_at = NOW() '
+                'WHERE player_id = %s AND mode = %s AND status = %s RETURNING id',
+                ('lost', pid, 'random', 'active'),
+                conn=conn,
+            )
 
-        word = query_db(
-            'SELECT id, word FROM words '
-            'WHERE id NOT IN (SELECT word_id FROM games WHERE player_id = %s) '
-            'ORDER BY RANDOM() LIMIT 1',
-            (pid,),
-            one=True,
-        )
-        if not word:
-            word = query_db('SELECT id, word FROM words ORDER BY RANDOM() LIMIT 1', one=True)
-        if not word:
-            return jsonify({'error': 'No words available'}), 500
-
-        game = execute_db(
-            'INSERT INTO games (player_id, word_id, mode) VALUES (%s, %s, %s) '
-            'RETURNING id, status, num_guesses, created_at',
-            (pid, word['id'], 'random'),
-        )
+            # Sample ~5% of the dictionary instead of sorting the whole table;
+            # fall back to a full scan only when the sample has no unplayed word.
+            word = query_db(
+                'SELECT w.id, w.word FROM words w TABLESAMPLE BERNOULLI (5) '
+                'LEFT JOIN games g ON g.word_id = w.id AND g.player_id = %s '
+                'WHERE g.id IS NULL '
+                'ORDER BY RANDOM() LIMIT 1',
+                (pid,),
+                one=True,
+                conn=conn,
+            )
+            if not word:
+                word = query_db(
+                    'SELECT w.id, w.word FROM words w '
+                    'LEFT JOIN games g ON g.word_id = w.id AND g.player_id = %s '
+                    'WHERE g.id IS NULL '
+                    'ORDER BY RANDOM() LIMIT 1',
+                    (pid,),
+                    one=True,
+                    conn=conn,
+                )
+            if not word:
+                word = query_db(
+                    'SELECT id, word FROM words ORDER BY RANDOM() LIMIT 1', one=True, conn=conn,
+                )
+            if not word:
+                return jsonify({'error': 'No words available'}), 500
+
+            game = execute_db(
+                'INSERT INTO games (player_id, word_id, mode) VALUES (%s, %s, %s) '
+                'RETURNING id, status, num_guesses, created_at',
+                (pid, word['id'], 'random'),
+                conn=conn,
+            )
         return jsonify({'game_id': game['id'], 'mode': 'random', 'guesses': []}), 201
 
 
 @bp.route('/api/game/current')
 def current_game():
-    fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if not player:
         return jsonify({'error': 'Player not registered'}), 401
 
     pid = player['id']
     _expire_race_game_if_needed(pid)
 
-    game = query_db(
-        'SELECT g.id, g.status, g.num_guesses, g.created_at, g.mode, g.race_round_id '
-        'FROM games g WHERE g.player_id = %s AND g.status = %s '
-        'ORDER BY g.created_at DESC LIMIT 1',
-        (pid, 'active'),
-        one=True,
-    )
+    game = query_prepared('active_game', (pid,), one=True)
     if not game:
         return jsonify({'error': 'No active game'}), 404
 
-    guesses = query_db(
-        'SELECT guess_word, guess_number, result FROM guesses '
-        'WHERE game_id = %s ORDER BY guess_number',
-        (game['id'],),
-    )
+    # Fetch the guesses and, for race games, the round end in one round-trip
+    calls = [('guesses_by_game', (game['id'],))]
+    if game['race_round_id']:
+        calls.append(('race_round_ends_at', (game['race_round_id'],)))
+    results = query_pipeline(calls)
+    guesses = results[0]
 
     resp_data = {
         'game_id': game['id'],
         'status': game['status'],
         'mode': game['mode'],
         'num_guesses': game['num_guesses'],
-        'guesses': [
-            {'guess': g['guess_word'], 'guess_number': g['guess_number'], 'result': g['result']}
-            for g in guesses
-        ],
+        'guesses': [_serialize_guess(row) for row in guesses],
     }
 
-    if game['race_round_id']:
-        rnd = query_db(
-            'SELECT ends_at FROM race_rounds WHERE id = %s',
-            (game['race_round_id'],),
-            one=True,
-        )
-        if rnd:
-            ends = rnd['ends_at']
-            resp_data['round_ends_at'] = ends.isoformat() + 'Z' if ends.tzinfo is None else ends.isoformat()
+    if len(results) > 1 and results[1]:
+        ends = results[1][0]['ends_at']
+        resp_data['round_ends_at'] = ends.isoformat() + 'Z' if ends.tzinfo is None else ends.isoformat()
 
     return jsonify(resp_data)
 
 
 @bp.route('/api/game/guess', methods=['POST'])
 def guess():
-    fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if not player:
         return jsonify({'error': 'Player not registered'}), 401
 
-    game = query_db(
-        'SELECT g.id, g.status, g.num_guesses, g.mode, g.race_round_id, w.word '
-        'FROM games g JOIN words w ON w.id = g.word_id '
-        'WHERE g.player_id = %s AND g.status = %s '
-        'ORDER BY g.created_at DESC LIMIT 1',
-        (player['id'], 'active'),
-        one=True,
-    )
-    if not game:
-        return jsonify({'error': 'No active game'}), 404
-
-    # Enforce race timer
-    if game['mode'] == 'race' and game['race_round_id']:
-        rnd = query_db(
-            'SELECT ends_at FROM race_rounds WHERE id = %s',
-            (game['race_round_id'],),
-            one=True,
-        )
-        if rnd:
-            ends_at = rnd['ends_at']
+    data = request.get_json(silent=True) or {}
+    guess_word = data.get('guess', '').strip().lower()
+    # Loaded before the transaction so the first load does not need a second connection
+    valid_words = _valid_words()
+
+    # Lock the game, check the race timer and record the guess as one transaction
+    with transaction() as conn:
+        game = query_prepared('active_game_for_update', (player['id'],), one=True, conn=conn)
+        if not game:
+            return jsonify({'error': 'No active game'}), 404
+
+        # Enforce race timer
+        if game['mode'] == 'race' and game['round_ends_at'] is not None:
+            ends_at = game['round_ends_at']
             if ends_at.tzinfo is None:
                 ends_at = ends_at.replace(tzinfo=timezone.utc)
             if datetime.now(timezone.utc) >= ends_at:
                 execute_db(
                     'UPDATE games SET status = %s, completed_at = %s WHERE id = %s RETURNING id',
-                    ('lost', rnd['ends_at'], game['id']),
+                    ('lost', game['round_ends_at'], game['id']),
+                    conn=conn,
                 )
                 return jsonify({
                     'error': 'Round expired',
@@ -417,61 +472,42 @@ def guess():
                     'game_id': game['id'],
                 }), 410
 
-    data = request.get_json(silent=True) or {}
-    guess_word = data.get('guess', '').strip().lower()
+        if len(guess_word) != 5 or not (guess_word.isascii() and guess_word.isalpha()):
+            return jsonify({'error': 'Guess must be exactly 5 letters'}), 400
 
-    if len(guess_word) != 5 or not guess_word.isalpha():
-        return jsonify({'error': 'Guess must be exactly 5 letters'}), 400
+        if guess_word not in valid_words:
+            return jsonify({'error': 'Not a valid word'}), 400
 
-    # Validate against dictionary
-    valid = query_db(
-        'SELECT 1 FROM words WHERE word = %s',
-        (guess_word,),
-        one=True,
-    )
-    if not valid:
-        return jsonify({'error': 'Not a valid word'}), 400
-
-    target = game['word']
-    guess_number = game['num_guesses'] + 1
-    result = _evaluate_guess(guess_word, target)
+        target = game['word']
+        guess_number = game['num_guesses'] + 1
+        result = _evaluate_guess(guess_word, target)
 
-    won = guess_word == target
-    lost = guess_number == 6 and not won
+        won = guess_word == target
+        lost = guess_number == 6 and not won
 
-    if won:
-        new_status = 'won'
-    elif lost:
-        new_status = 'lost'
-    else:
-        new_status = 'active'
-
-    # Insert guess row
-    execute_db(
-        'INSERT INTO guesses (game_id, guess_word, guess_number, result) '
-        'VALUES (%s, %s, %s, %s)',
-        (game['id'], guess_word, guess_number, json.dumps(result)),
-    )
-
-    # Update game
-    if new_status in ('won', 'lost'):
-        execute_db(
-            'UPDATE games SET num_guesses = %s, status = %s, completed_at = NOW() '
-            'WHERE id = %s RETURNING id',
-            (guess_number, new_status, game['id']),
-        )
-    else:
-        execute_db(
-            'UPDATE games SET num_guesses = %s WHERE id = %s RETURNING id',
-            (guess_number, game['id']),
+        if won:
+            new_status = 'won'
+        elif lost:
+            new_status = 'lost'
+        else:
+            new_status = 'active'
+
+        # The guesses so far arrive with the locked game row.  Its guess list
+        # comes from the statement's snapshot, so if another guess committed
+        # while we waited for the lock, re-read it.
+        prior_guesses = game['guesses']
+        if len(prior_guesses) != game['num_guesses']:
+            prior_guesses = query_prepared('guesses_by_game', (game['id'],), conn=conn)
+
+        query_prepared(
+            'record_guess',
+            (game['id'], guess_word, guess_number, new_status, result),
+            conn=conn,
         )
 
-    # Build response
-    all_guesses = query_db(
-        'SELECT guess_word, guess_number, result FROM guesses '
-        'WHERE game_id = %s ORDER BY guess_number',
-        (game['id'],),
-    )
+    all_guesses = prior_guesses + [
+        {'guess_word': guess_word, 'guess_number': guess_number, 'result': result},
+    ]
 
     resp = {
         'game_id': game['id'],
@@ -481,12 +517,9 @@ def guess():
         'guess': {
             'guess': guess_word,
             'guess_number': guess_number,
-            'result': result,
+            'result': _expand_result(guess_word, result),
         },
-        'guesses': [
-            {'guess': g['guess_word'], 'guess_number': g['guess_number'], 'result': g['result']}
-            for g in all_guesses
-        ],
+        'guesses': [_serialize_guess(row) for row in all_guesses],
     }
 
     if lost:
@@ -497,21 +530,11 @@ def guess():
 
 @bp.route('/api/leaderboard')
 def leaderboard():
-    champions = query_db(
-        'SELECT name, games_won, games_played, avg_guesses_per_win, '
-        '       current_streak, best_streak '
-        'FROM leaderboard_stats '
-        'WHERE games_won >= 5 '
-        'ORDER BY avg_guesses_per_win ASC '
-        'LIMIT 20',
-    )
-    prolific = query_db(
-        'SELECT name, games_won, games_played, avg_guesses_per_win, '
-        '       current_streak, best_streak '
-        'FROM leaderboard_stats '
-        'ORDER BY games_won DESC '
-        'LIMIT 20',
-    )
+    # Both rankings share one connection and one round-trip
+    champions, prolific = query_pipeline([
+        ('leaderboard_champions', ()),
+        ('leaderboard_prolific', ()),
+    ])
 
     def _serialize(rows):
         return [
@@ -536,19 +559,11 @@ def leaderboard():
 
 @bp.route('/api/stats')
 def stats():
-    fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if not player:
         return jsonify({'error': 'Player not found'}), 404
 
-    row = query_db(
-        'SELECT games_won, games_played, avg_guesses_per_win, '
-        '       current_streak, best_streak '
-        'FROM leaderboard_stats '
-        'WHERE player_id = %s',
-        (player['id'],),
-        one=True,
-    )
+    row = query_prepared('player_stats', (player['id'],), one=True)
 
     if not row:
         return jsonify({
@@ -588,8 +603,7 @@ def race_status():
     # Check if current player already played this round
     played = False
     player_result = None
-    fp = get_fingerprint()
-    player = _player_by_fingerprint(fp)
+    player = _current_player()
     if player:
         game = query_db(
             'SELECT id, status, num_guesses FROM games '
@@ -17,11 +17,16 @@ def seed_words():
     conn = get_db()
     try:
         with conn.cursor() as cur:
-            for word in WORDS:
-                cur.execute(
-                    'INSERT INTO words (word) VALUES (%s) ON CONFLICT DO NOTHING',
-                    (word.lower(),),
-                )
+            # COPY into a scratch table, then merge so re-seeding skips
+            # words that are already present.
+            cur.execute('CREATE TEMP TABLE words_seed (word VARCHAR(5)) ON COMMIT DROP')
+            with cur.copy('COPY words_seed (word) FROM STDIN') as copy:
+                for word in WORDS:
+                    copy.write_row((word.lower(),))
+            cur.execute(
+                'INSERT INTO words (word) SELECT DISTINCT word FROM words_seed '
+                'ON CONFLICT DO NOTHING'
+            )
         conn.commit()
         print(f'Seeded {len(WORDS)} words.')
     finally:
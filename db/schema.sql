@@ -9,18 +9,25 @@ CREATE TABLE IF NOT EXISTS words (
     word  VARCHAR(5) NOT NULL UNIQUE
 );
 
-CREATE INDEX IF NOT EXISTS idx_words_word ON words (word);
+-- The UNIQUE constraint above already provides a unique index on word;
+-- a second plain index only doubles the write and cache cost.
+DROP INDEX IF EXISTS idx_words_word;
 
 -- Players identified by a browser fingerprint derived from
 -- SHA-256(IP + User-Agent + Accept-Language).
 CREATE TABLE IF NOT EXISTS players (
     id          SERIAL PRIMARY KEY,
     name        VARCHAR(50) NOT NULL,
-    fingerprint VARCHAR(64) NOT NULL UNIQUE,
+    fingerprint VARCHAR(64) NOT NULL,
     created_at  TIMESTAMP   NOT NULL DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_players_fingerprint ON players (fingerprint);
+-- Unique covering index: fingerprint lookups are answered by an index-only
+-- scan.  It replaces the original UNIQUE constraint and plain index.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_players_fingerprint_covering
+    ON players (fingerprint) INCLUDE (id, name, created_at);
+ALTER TABLE players DROP CONSTRAINT IF EXISTS players_fingerprint_key;
+DROP INDEX IF EXISTS idx_players_fingerprint;
 
 -- Race rounds: every N seconds a new word is chosen for all players.
 -- round_number is deterministic: floor(epoch / round_seconds).
@@ -54,97 +61,140 @@ CREATE TABLE IF NOT EXISTS games (
 CREATE INDEX IF NOT EXISTS idx_games_player_id    ON games (player_id);
 CREATE INDEX IF NOT EXISTS idx_games_status        ON games (status);
 CREATE INDEX IF NOT EXISTS idx_games_race_round_id ON games (race_round_id);
+-- Every API call looks up the player's active game.
+CREATE INDEX IF NOT EXISTS idx_games_player_active ON games (player_id)
+    WHERE status = 'active';
 
 -- Individual guesses within a game (max 6 per game).
--- result is a JSONB array of objects: [{letter, status}]
--- where status is one of 'correct', 'present', 'absent'.
+-- result holds one status code per letter of guess_word:
+-- 'C' (correct), 'P' (present) or 'A' (absent), e.g. 'CAPAA'.
 CREATE TABLE IF NOT EXISTS guesses (
     id           SERIAL PRIMARY KEY,
     game_id      INTEGER    NOT NULL REFERENCES games(id),
     guess_word   VARCHAR(5) NOT NULL,
     guess_number INTEGER    NOT NULL CHECK (guess_number BETWEEN 1 AND 6),
-    result       JSONB      NOT NULL,
-    created_at   TIMESTAMP  NOT NULL DEFAULT NOW(),
-    UNIQUE (game_id, guess_number)
+    result       CHAR(5)    NOT NULL,
+    created_at   TIMESTAMP  NOT NULL DEFAULT NOW()
 );
 
--- Leaderboard view providing aggregated player statistics.
+-- Unique covering index: a game's guess list is read by an index-only
+-- scan.  It replaces the original UNIQUE (game_id, guess_number) constraint.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_guesses_game_number_covering
+    ON guesses (game_id, guess_number) INCLUDE (guess_word, result);
+ALTER TABLE guesses DROP CONSTRAINT IF EXISTS guesses_game_id_guess_number_key;
+
+-- Databases created before the status codes stored result as a JSONB
+-- array of {letter, status} objects; convert them in place.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'guesses'
+            AND column_name = 'result' AND data_type = 'jsonb'
+    ) THEN
+        ALTER TABLE guesses ALTER COLUMN result TYPE CHAR(5) USING (
+            CASE result->0->>'status' WHEN 'correct' THEN 'C' WHEN 'present' THEN 'P' ELSE 'A' END
+            || CASE result->1->>'status' WHEN 'correct' THEN 'C' WHEN 'present' THEN 'P' ELSE 'A' END
+            || CASE result->2->>'status' WHEN 'correct' THEN 'C' WHEN 'present' THEN 'P' ELSE 'A' END
+            || CASE result->3->>'status' WHEN 'correct' THEN 'C' WHEN 'present' THEN 'P' ELSE 'A' END
+            || CASE result->4->>'status' WHEN 'correct' THEN 'C' WHEN 'present' THEN 'P' ELSE 'A' END
+        );
+    END IF;
+END $$;
+
+-- Per-player statistics over completed games, computed live.
 -- current_streak: number of consecutive wins ending at the most recent game.
 -- best_streak:    longest consecutive-win run across all completed games.
-CREATE OR REPLACE VIEW leaderboard_stats AS
-WITH completed_games AS (
-    -- All finished games ordered chronologically per player
-    SELECT
-        g.player_id,
-        g.id AS game_id,
-        g.status,
-        g.num_guesses,
-        g.completed_at,
-        ROW_NUMBER() OVER (PARTITION BY g.player_id ORDER BY g.completed_at) AS rn
-    FROM games g
-    WHERE g.status IN ('won', 'lost')
-),
-streak_groups AS (
-    -- Assign a group id that increments each time a player loses,
-    -- so consecutive wins share the same group.
-    SELECT
-        *,
-        rn - ROW_NUMBER() OVER (
-            PARTITION BY player_id, status ORDER BY completed_at
-        ) AS streak_grp
-    FROM completed_games
-),
-streaks AS (
-    SELECT
-        player_id,
-        streak_grp,
-        COUNT(*)           AS streak_len,
-        MAX(completed_at)  AS streak_end
-    FROM streak_groups
-    WHERE status = 'won'
-    GROUP BY player_id, streak_grp
-),
-best AS (
-    SELECT
-        player_id,
-        MAX(streak_len) AS best_streak
-    FROM streaks
-    GROUP BY player_id
-),
-current AS (
-    -- Current streak: the streak that includes the very last completed game,
-    -- but only if that last game was a win; otherwise 0.
-    SELECT
-        cg.player_id,
-        COALESCE(s.streak_len, 0) AS current_streak
-    FROM (
-        SELECT DISTINCT ON (player_id)
-            player_id, game_id, status
-        FROM completed_games
-        ORDER BY player_id, rn DESC
-    ) cg
-    LEFT JOIN streak_groups sg
-        ON sg.player_id = cg.player_id AND sg.game_id = cg.game_id
-    LEFT JOIN streaks s
-        ON s.player_id = sg.player_id AND s.streak_grp = sg.streak_grp
-            AND cg.status = 'won'
-)
+-- Every window is partitioned by player_id, so filtering the view on
+-- player_id only reads that player's games.
+CREATE OR REPLACE VIEW player_stats AS
 SELECT
     p.id AS player_id,
     p.name,
-    COUNT(*) FILTER (WHERE cg.status = 'won')  AS games_won,
-    COUNT(*)                                     AS games_played,
-    ROUND(AVG(cg.num_guesses) FILTER (WHERE cg.status = 'won'), 2)
-                                                 AS avg_guesses_per_win,
-    COALESCE(cur.current_streak, 0)              AS current_streak,
-    COALESCE(b.best_streak, 0)                   AS best_streak
+    s.games_won,
+    s.games_played,
+    s.avg_guesses_per_win,
+    s.current_streak,
+    s.best_streak
 FROM players p
-JOIN completed_games cg ON cg.player_id = p.id
-LEFT JOIN current cur   ON cur.player_id = p.id
-LEFT JOIN best b        ON b.player_id   = p.id
-GROUP BY p.id, p.name, cur.current_streak, b.best_streak
+JOIN (
+    SELECT
+        player_id,
+        COUNT(*) FILTER (WHERE status = 'won')  AS games_won,
+        COUNT(*)                                 AS games_played,
+        ROUND(AVG(num_guesses) FILTER (WHERE status = 'won'), 2)
+                                                 AS avg_guesses_per_win,
+        -- Every game after the last loss is a win.
+        COUNT(*) - COALESCE(MAX(rn) FILTER (WHERE status = 'lost'), 0)
+                                                 AS current_streak,
+        COALESCE(MAX(run_pos) FILTER (WHERE status = 'won'), 0)
+                                                 AS best_streak
+    FROM (
+        -- Position of each game within its run of equal results.
+        SELECT
+            *,
+            ROW_NUMBER() OVER (
+                PARTITION BY player_id, status, streak_grp ORDER BY completed_at, id
+            ) AS run_pos
+        FROM (
+            -- rn orders a player's finished games; streak_grp stays
+            -- constant across each run of consecutive equal results.
+            SELECT
+                g.player_id,
+                g.id,
+                g.status,
+                g.num_guesses,
+                g.completed_at,
+                ROW_NUMBER() OVER player_games AS rn,
+                ROW_NUMBER() OVER player_games - ROW_NUMBER() OVER (
+                    PARTITION BY g.player_id, g.status ORDER BY g.completed_at, g.id
+                ) AS streak_grp
+            FROM games g
+            WHERE g.status IN ('won', 'lost')
+            WINDOW player_games AS (PARTITION BY g.player_id ORDER BY g.completed_at, g.id)
+        ) ordered_games
+    ) runs
+    GROUP BY player_id
+) s ON s.player_id = p.id;
+
+-- Leaderboard: player_stats materialized for the ranking queries.
+-- A background thread in the app refreshes it every
+-- LEADERBOARD_REFRESH_SECONDS.
+DO $$
+BEGIN
+    -- Older databases have leaderboard_stats as a plain view, or as a
+    -- materialized view with its own copy of the player_stats query.
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE relname = 'leaderboard_stats' AND relkind = 'v'
+            AND relnamespace = current_schema()::regnamespace
+    ) THEN
+        DROP VIEW leaderboard_stats;
+    ELSIF EXISTS (
+        SELECT 1 FROM pg_class c
+        WHERE c.relname = 'leaderboard_stats' AND c.relkind = 'm'
+            AND c.relnamespace = current_schema()::regnamespace
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+                WHERE r.ev_class = c.oid AND d.refobjid = 'player_stats'::regclass
+            )
+    ) THEN
+        DROP MATERIALIZED VIEW leaderboard_stats;
+    END IF;
+END $$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard_stats AS
+SELECT * FROM player_stats
 ORDER BY games_won DESC, avg_guesses_per_win ASC;
 
+-- The unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_leaderboard_stats_player_id
+    ON leaderboard_stats (player_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_stats_games_won
+    ON leaderboard_stats (games_won DESC);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_stats_avg_guesses
+    ON leaderboard_stats (avg_guesses_per_win);
+
 -- Race round leaderboard: per-round results sorted by fewest guesses then fastest time.
 CREATE OR REPLACE VIEW race_round_results AS
 SELECT
@@ -164,4 +214,7 @@ JOIN games g  ON g.race_round_id = rr.id AND g.status IN ('won', 'lost')
 JOIN players p ON p.id = g.player_id
 ORDER BY rr.round_number DESC, g.status ASC, g.num_guesses ASC, solve_duration ASC;
 
+-- Refresh planner statistics so the new indexes are picked up immediately.
+ANALYZE words, players, games, guesses;
+
 COMMIT;
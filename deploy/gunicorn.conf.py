@@ -0,0 +1,8 @@
+"""Gunicorn hooks for the WordBlitz service."""
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauge samples from the metrics directory."""
+    multiprocess.mark_process_dead(worker.pid)